@@ -1,97 +1,43 @@
+import aiohttp
 import discord
 from discord.ext import commands
 import os
 import asyncio
-import socket
 import ipaddress
 from dotenv import load_dotenv
-from typing import Tuple, Optional
+
+from net_utils import cached_getaddrinfo, cached_whois_query, first_reachable, scan_host
+
+try:
+    # optional: libuv-backed event loop (Linux/macOS); falls back to the default loop
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
 
 load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
+# half-open SYN scanning for !homeports; needs scapy and CAP_NET_RAW
+HOMEPORTS_SYN_SCAN = os.getenv("HOMEPORTS_SYN_SCAN", "").lower() in ("1", "true", "yes")
 
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
 
-# -----------------------
-# Helpers
-# -----------------------
-async def tcp_connect_latency(host: str, port: int, timeout: float = 2.0) -> Tuple[bool, Optional[float], Optional[str]]:
-    """
-    Attempt a TCP connect to host:port (supports hostnames and IPs, IPv4/IPv6).
-    Returns (success, latency_ms or None, resolved_ip or None).
-    Non-blocking-ish: uses getaddrinfo and run_in_executor for connect.
-    """
-    loop = asyncio.get_running_loop()
-    start = loop.time()
-    try:
-        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
-    except Exception:
-        return False, None, None
+class NetBot(commands.Bot):
+    """Bot whose Discord HTTP session uses a tuned keep-alive connector."""
 
-    for family, socktype, proto, canonname, sockaddr in infos:
-        ip = sockaddr[0]
-        s = None
-        try:
-            s = socket.socket(family, socket.SOCK_STREAM)
-            s.settimeout(timeout)
-            # run blocking connect in executor
-            await loop.run_in_executor(None, s.connect, sockaddr)
-            s.close()
-            latency_ms = (loop.time() - start) * 1000.0
-            return True, latency_ms, ip
-        except Exception:
-            try:
-                if s:
-                    s.close()
-            except Exception:
-                pass
-            continue
-    return False, None, None
-
-def simple_whois_query_blocking(domain: str, timeout: int = 5) -> str:
-    """
-    Blocking WHOIS lookup that queries IANA for the whois server, then queries that server.
-    Returns text (may be long).
-    """
-    domain = domain.strip()
-    if not domain:
-        return "Empty domain."
-    query = domain + "\r\n"
-    try:
-        # ask IANA for whois server
-        with socket.create_connection(("whois.iana.org", 43), timeout=timeout) as s:
-            s.sendall(query.encode())
-            resp = b""
-            while True:
-                data = s.recv(4096)
-                if not data:
-                    break
-                resp += data
-            iana_text = resp.decode(errors="ignore")
-
-        # find whois server in IANA response
-        whois_server = None
-        for line in iana_text.splitlines():
-            if line.lower().startswith("whois:"):
-                whois_server = line.split(":", 1)[1].strip()
-                break
-        if not whois_server:
-            # fallback
-            whois_server = "whois.arin.net"
-
-        with socket.create_connection((whois_server, 43), timeout=timeout) as s:
-            s.sendall(query.encode())
-            resp = b""
-            while True:
-                data = s.recv(4096)
-                if not data:
-                    break
-                resp += data
-            return resp.decode(errors="ignore")
-    except Exception as e:
-        return f"WHOIS error: {type(e).__name__}: {e}"
+    async def login(self, token: str) -> None:
+        # the connector must be created on the running loop, before login opens the session
+        self.http.connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=20,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True,
+        )
+        await super().login(token)
+
+bot = NetBot(command_prefix="!", intents=intents)
 
 # -----------------------
 # Commands
@@ -103,6 +49,7 @@ async def cmd_ping(ctx, target: str, port: int = None):
     Usage:
       !ping <host_or_ip> [port]
     Tries common ports (80,443,53,22) unless a specific port is provided.
+    Uses an in-process TCP connect probe rather than ICMP, so no ping subprocess is spawned.
     Supports IPv4 and IPv6.
     """
     await ctx.send(f"Pinging `{target}`...")
@@ -114,12 +61,11 @@ async def cmd_ping(ctx, target: str, port: int = None):
         ports_to_try = [80, 443, 53, 22]
 
     timeout = 2.0
-    # First try the name/ip directly with each port
-    for p in ports_to_try:
-        ok, latency, ip = await tcp_connect_latency(target, p, timeout=timeout)
-        if ok:
-            await ctx.send(f"✅ `{target}` ({ip}) reachable on port `{p}` — {latency:.1f} ms")
-            return
+    # First try the name/ip directly, racing all ports
+    ok, latency, ip, p = await first_reachable([(target, p) for p in ports_to_try], timeout=timeout)
+    if ok:
+        await ctx.send(f"✅ `{target}` ({ip}) reachable on port `{p}` — {latency:.1f} ms")
+        return
 
     # If target is not a literal IP, attempt to resolve to IPs and try those (sometimes CNAMEs)
     try:
@@ -130,18 +76,16 @@ async def cmd_ping(ctx, target: str, port: int = None):
 
     if not is_ip:
         try:
-            loop = asyncio.get_running_loop()
-            infos = await loop.getaddrinfo(target, None)
+            infos = await cached_getaddrinfo(target, None)
             resolved_ips = []
             for fam, st, pr, cn, sa in infos:
                 resolved_ips.append(sa[0])
             resolved_ips = list(dict.fromkeys(resolved_ips))  # unique preserve order
-            for ip in resolved_ips:
-                for p in ports_to_try:
-                    ok, latency, resolved_ip = await tcp_connect_latency(ip, p, timeout=timeout)
-                    if ok:
-                        await ctx.send(f"✅ `{target}` resolved to `{resolved_ip}` and is reachable on port `{p}` — {latency:.1f} ms")
-                        return
+            candidates = [(ip, p) for ip in resolved_ips for p in ports_to_try]
+            ok, latency, resolved_ip, p = await first_reachable(candidates, timeout=timeout)
+            if ok:
+                await ctx.send(f"✅ `{target}` resolved to `{resolved_ip}` and is reachable on port `{p}` — {latency:.1f} ms")
+                return
         except Exception:
             pass
 
@@ -152,53 +96,28 @@ async def cmd_whois(ctx, domain: str):
     """
     Usage:
       !whois example.com
-    Performs a basic public WHOIS lookup (blocking work runs in executor).
+    Performs a basic public WHOIS lookup.
     """
     await ctx.defer()  # give the bot more time if lookup is slow
-    loop = asyncio.get_running_loop()
-    raw = await loop.run_in_executor(None, simple_whois_query_blocking, domain)
+    raw = await cached_whois_query(domain)
     # truncate if too long
     if len(raw) > 1900:
         raw = raw[:1890] + "\n...truncated..."
     await ctx.send(f"WHOIS for `{domain}`:\n```\n{raw}\n```")
 
 # Keep your homeports scanner (optional)
-COMMON_PORTS = [
-    21, 22, 23, 25, 53, 80, 110, 143, 161, 443, 445, 993, 995,
-    3306, 3389, 5900, 8080, 25565, 32400
-]
-
-async def scan_port(host, port, semaphore):
-    async with semaphore:
-        try:
-            conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            conn.settimeout(0.6)
-            result = conn.connect_ex((host, port))
-            conn.close()
-            return port, result == 0
-        except:
-            return port, False
+HOMEPORTS_REPLY = "Home port scan for `{host}` — {count} open ports: **{ports}** | closed: rest"
 
 @bot.command(name="homeports")
 async def cmd_homeports(ctx, host: str):
     """Scan common home ports"""
     await ctx.defer()
-    semaphore = asyncio.Semaphore(12)
-    tasks = [scan_port(host, port, semaphore) for port in COMMON_PORTS]
-    results = await asyncio.gather(*tasks)
-
-    lines = []
-    open_count = 0
-    for port, is_open in results:
-        if is_open:
-            open_count += 1
-            lines.append(f"`{port}` — **OPEN**")
-        else:
-            lines.append(f"`{port}` — closed")
-    out = f"Home port scan for `{host}` — {open_count} open ports:\n" + "\n".join(lines)
-    if len(out) > 2000:
-        out = out[:1990] + "\n...truncated..."
-    await ctx.send(out)
+    results = await scan_host(host, syn=HOMEPORTS_SYN_SCAN)
+
+    # one compact message; fits well under 2000 chars for COMMON_PORTS
+    open_ports = [port for port, is_open in results if is_open]
+    open_list = ", ".join(map(str, open_ports)) or "none"
+    await ctx.send(HOMEPORTS_REPLY.format(host=host, count=len(open_ports), ports=open_list))
 
 # -----------------------
 # Events & run
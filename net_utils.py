@@ -0,0 +1,386 @@
+"""
+Network helpers shared by the bot commands: cached DNS, TCP probes and WHOIS.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import errno
+import functools
+import ipaddress
+import re
+import socket
+import time
+from typing import Dict, List, Tuple, Optional
+
+COMMON_PORTS: Tuple[int, ...] = (
+    21, 22, 23, 25, 53, 80, 110, 143, 161, 443, 445, 993, 995,
+    3306, 3389, 5900, 8080, 25565, 32400
+)
+
+DNS_CACHE_TTL = 60.0
+_DNS_CACHE: Dict[tuple, Tuple[float, list]] = {}
+_DNS_INFLIGHT: Dict[tuple, "asyncio.Future[list]"] = {}
+
+def _dns_done(key: tuple, fut: "asyncio.Future[list]") -> None:
+    _DNS_INFLIGHT.pop(key, None)
+    if fut.cancelled() or fut.exception() is not None:
+        return
+    now = time.monotonic()
+    for k in [k for k, (expires, _) in _DNS_CACHE.items() if expires <= now]:
+        del _DNS_CACHE[k]
+    _DNS_CACHE[key] = (now + DNS_CACHE_TTL, fut.result())
+
+async def cached_getaddrinfo(host: str, port: Optional[int]) -> List[tuple]:
+    """
+    getaddrinfo with a short TTL cache keyed by host; concurrent callers for the same host share one lookup.
+    The host is resolved once with port 0 and the requested port is substituted into each sockaddr.
+    IP literals are only parsed and failures are not cached.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        ipaddress.ip_address(host)
+        is_ip = True
+    except ValueError:
+        is_ip = False
+
+    if is_ip:
+        # IP literals only need parsing; skip DNS, service lookup and the cache entirely
+        infos = await loop.getaddrinfo(
+            host, 0, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP,
+            flags=socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+        )
+    else:
+        key = (host,)
+        entry = _DNS_CACHE.get(key)
+        if entry and entry[0] > time.monotonic():
+            infos = entry[1]
+        else:
+            fut = _DNS_INFLIGHT.get(key)
+            if fut is None:
+                fut = asyncio.ensure_future(
+                    loop.getaddrinfo(host, 0, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP)
+                )
+                _DNS_INFLIGHT[key] = fut
+                fut.add_done_callback(functools.partial(_dns_done, key))
+            # shield so a cancelled caller (e.g. a losing ping race) does not cancel the shared lookup
+            infos = await asyncio.shield(fut)
+    port = port or 0
+    return [
+        (family, socktype, proto, canonname, (sockaddr[0], port) + tuple(sockaddr[2:]))
+        for family, socktype, proto, canonname, sockaddr in infos
+    ]
+
+def _set_nodelay(sock: Optional[socket.socket]) -> None:
+    """Disable Nagle on a TCP socket so small writes and teardown are not delayed."""
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
+
+async def tcp_connect_latency(host: str, port: int, timeout: float = 2.0) -> Tuple[bool, Optional[float], Optional[str]]:
+    """
+    Attempt a TCP connect to host:port (supports hostnames and IPs, IPv4/IPv6).
+    Returns (success, latency_ms or None, resolved_ip or None); latency covers the successful connect only.
+    Non-blocking: uses a cached getaddrinfo and loop.sock_connect, so no executor thread is held.
+    """
+    loop = asyncio.get_running_loop()
+    loop_time = loop.time
+    try:
+        infos = await cached_getaddrinfo(host, port)
+    except Exception:
+        return False, None, None
+
+    for info in infos:
+        family = info[0]
+        sockaddr = info[4]
+        try:
+            s = socket.socket(family, socket.SOCK_STREAM)
+        except OSError:
+            continue
+        try:
+            _set_nodelay(s)
+            s.setblocking(False)
+            # time only the connect, so DNS and earlier failed addresses don't inflate the RTT
+            start = loop_time()
+            await asyncio.wait_for(loop.sock_connect(s, sockaddr), timeout)
+            latency_ms = (loop_time() - start) * 1000.0
+            return True, latency_ms, sockaddr[0]
+        except (asyncio.TimeoutError, OSError, OverflowError):
+            # refused, unreachable, timed out or out-of-range port on this address; try the next one
+            continue
+        finally:
+            s.close()
+    return False, None, None
+
+async def first_reachable(candidates, timeout: float = 2.0) -> Tuple[bool, Optional[float], Optional[str], Optional[int]]:
+    """
+    Race tcp_connect_latency over (host, port) candidates concurrently.
+    Returns (success, latency_ms, resolved_ip, port) for the first success; remaining probes are cancelled.
+    """
+    tasks = {
+        asyncio.create_task(tcp_connect_latency(h, p, timeout=timeout)): p
+        for h, p in candidates
+    }
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for d in done:
+                p = tasks.pop(d)
+                ok, latency, ip = d.result()
+                if ok:
+                    return True, latency, ip, p
+        return False, None, None, None
+    finally:
+        for t in tasks:
+            t.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+async def adaptive_timeout(host: str, default: float = 0.6) -> float:
+    """
+    Probe timeout scaled to the host's RTT: max(100 ms, 4x the latency of a quick connect to port 80/443).
+    Falls back to default when neither calibration port answers.
+    """
+    ok, latency, _, _ = await first_reachable([(host, 80), (host, 443)], timeout=default)
+    if not ok:
+        return default
+    return max(0.1, 4 * latency / 1000.0)
+
+# TLD -> whois server, learned from IANA; lives for the process lifetime
+_WHOIS_SERVER_BY_TLD: Dict[str, str] = {}
+_WHOIS_SERVER_RE = re.compile(rb"(?im)^whois:[ \t]*(\S+)")
+
+async def _whois_request(server: str, query: str, timeout: float) -> bytes:
+    """Send one WHOIS query to server:43 and read the reply until the server closes."""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(server, 43), timeout)
+    try:
+        writer.write(query.encode())
+        await writer.drain()
+        return await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+def _whois_tld(domain: str) -> Optional[str]:
+    """TLD label used as the whois server cache key, or None for IP addresses and names without a real TLD."""
+    name = domain.rstrip(".")
+    try:
+        ipaddress.ip_address(name)
+        return None
+    except ValueError:
+        pass
+    tld = name.rsplit(".", 1)[-1].lower()
+    if tld.isalpha() or tld.startswith("xn--"):
+        return tld
+    return None
+
+async def whois_query(domain: str, timeout: float = 5.0) -> str:
+    """
+    WHOIS lookup that queries IANA for the whois server, then queries that server.
+    The IANA answer is cached per TLD so repeat lookups skip that round trip; IP queries always go through IANA.
+    Returns text (may be long).
+    """
+    domain = domain.strip()
+    if not domain:
+        return "Empty domain."
+    query = domain + "\r\n"
+    tld = _whois_tld(domain)
+    try:
+        whois_server = _WHOIS_SERVER_BY_TLD.get(tld) if tld else None
+        if not whois_server:
+            # ask IANA for whois server and pick it out of the raw reply
+            m = _WHOIS_SERVER_RE.search(await _whois_request("whois.iana.org", query, timeout))
+            if m:
+                whois_server = m.group(1).decode(errors="ignore")
+                if tld:
+                    _WHOIS_SERVER_BY_TLD[tld] = whois_server
+            else:
+                # fallback
+                whois_server = "whois.arin.net"
+
+        return (await _whois_request(whois_server, query, timeout)).decode(errors="ignore")
+    except Exception as e:
+        return f"WHOIS error: {type(e).__name__}: {e}"
+
+WHOIS_RESULT_TTL = 30.0
+_WHOIS_RESULTS: Dict[str, Tuple[float, str]] = {}
+_WHOIS_INFLIGHT: Dict[str, "asyncio.Task[str]"] = {}
+
+def _whois_done(key: str, task: "asyncio.Task[str]") -> None:
+    _WHOIS_INFLIGHT.pop(key, None)
+    if task.cancelled() or task.exception() is not None:
+        return
+    raw = task.result()
+    if raw.startswith("WHOIS error"):
+        return
+    now = time.monotonic()
+    for k in [k for k, (expires, _) in _WHOIS_RESULTS.items() if expires <= now]:
+        del _WHOIS_RESULTS[k]
+    _WHOIS_RESULTS[key] = (now + WHOIS_RESULT_TTL, raw)
+
+async def cached_whois_query(domain: str, timeout: float = 5.0) -> str:
+    """
+    whois_query with a short result cache; concurrent callers for the same domain share one in-flight lookup.
+    Errors are not cached.
+    """
+    key = domain.strip().lower()
+    entry = _WHOIS_RESULTS.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    task = _WHOIS_INFLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(whois_query(key, timeout))
+        _WHOIS_INFLIGHT[key] = task
+        task.add_done_callback(functools.partial(_whois_done, key))
+    # shield so one caller being cancelled does not cancel the lookup for the others
+    return await asyncio.shield(task)
+
+_EAFNOSUPPORT = {errno.EAFNOSUPPORT, getattr(errno, "WSAEAFNOSUPPORT", errno.EAFNOSUPPORT)}
+
+def _make_scan_socket(family: int) -> socket.socket:
+    """Non-blocking TCP socket with address reuse and TCP_NODELAY set, ready for loop.sock_connect."""
+    s = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        s.setblocking(False)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            try:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except OSError:
+                pass
+        _set_nodelay(s)
+    except BaseException:
+        s.close()
+        raise
+    return s
+
+async def probe(sock: socket.socket, sockaddr: tuple, timeout: float = 0.6) -> bool:
+    """Return True if sock connects to sockaddr within timeout. The caller owns and closes sock."""
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, sockaddr), timeout)
+    except (asyncio.TimeoutError, OSError):
+        return False
+    return True
+
+async def scan_port(sock: socket.socket, sockaddr: tuple, semaphore: asyncio.Semaphore, timeout: float = 0.6) -> Tuple[int, bool]:
+    async with semaphore:
+        return sockaddr[1], await probe(sock, sockaddr, timeout)
+
+async def connect_scan(host: str, ports: Tuple[int, ...], timeout: float = 0.6) -> List[Tuple[int, bool]]:
+    """
+    Full-connect scan of ports on every resolved address of host; a port is open if any address accepts.
+    All sockets are allocated up front, shared out to the probes, and closed together at the end.
+    """
+    try:
+        infos = await cached_getaddrinfo(host, None)
+    except (OSError, UnicodeError):
+        # unresolvable, or not a valid IDNA name (empty or over-long label)
+        infos = []
+    # one (family, sockaddr) per distinct address, in resolver order
+    addrs: Dict[str, Tuple[int, tuple]] = {}
+    for info in infos:
+        addrs.setdefault(info[4][0], (info[0], info[4]))
+
+    socks: List[socket.socket] = []
+    probes = []
+    try:
+        for family, addr in addrs.values():
+            family_socks: List[socket.socket] = []
+            try:
+                for _ in ports:
+                    sock = _make_scan_socket(family)
+                    socks.append(sock)
+                    family_socks.append(sock)
+            except OSError as e:
+                if e.errno not in _EAFNOSUPPORT:
+                    raise
+                # address family not supported here (e.g. no IPv6); the other addresses still get scanned
+                continue
+            probes.extend(
+                (sock, (addr[0], port) + tuple(addr[2:]))
+                for sock, port in zip(family_socks, ports)
+            )
+        semaphore = asyncio.Semaphore(64)
+        results = await asyncio.gather(*(scan_port(sock, sockaddr, semaphore, timeout) for sock, sockaddr in probes))
+    finally:
+        for sock in socks:
+            sock.close()
+    open_ports = {port for port, is_open in results if is_open}
+    return [(port, port in open_ports) for port in ports]
+
+# scapy's sr() blocks; keep it off the default executor and cap how many scans run at once
+_SYN_SCAN_EXEC = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="synscan")
+atexit.register(_SYN_SCAN_EXEC.shutdown)
+
+def _syn_scan_blocking(ips: List[str], ports: Tuple[int, ...], timeout: float) -> Optional[List[Tuple[int, bool]]]:
+    # optional dependency (pip install scapy); imported lazily because it is slow to load
+    from scapy.all import IP, TCP, sr
+    from scapy.error import Scapy_Exception
+
+    try:
+        answered, _ = sr(IP(dst=ips) / TCP(dport=list(ports), flags="S"), timeout=timeout, verbose=0)
+    except Scapy_Exception:
+        return None
+    if not answered:
+        # no SYN/ACK or RST at all: inconclusive (filtered, or replies not seen), let the caller connect-scan
+        return None
+    open_ports = set()
+    for _, reply in answered:
+        if reply.haslayer(TCP) and int(reply[TCP].flags) & 0x12 == 0x12:  # SYN/ACK
+            open_ports.add(reply[TCP].sport)
+    # the kernel answers the SYN/ACKs with RST since no local socket owns them
+    return [(port, port in open_ports) for port in ports]
+
+async def syn_scan(host: str, ports, timeout: float = 0.6) -> Optional[List[Tuple[int, bool]]]:
+    """
+    Half-open (SYN-only) scan of an IPv4 host, sent as one batch.
+    Needs scapy and CAP_NET_RAW, and only handles hosts whose addresses are all non-loopback IPv4.
+    Returns None otherwise, or when scapy fails or sees no replies, so callers can fall back to connect_scan.
+    """
+    try:
+        infos = await cached_getaddrinfo(host, None)
+    except (OSError, UnicodeError):
+        return None
+    ips = list(dict.fromkeys(info[4][0] for info in infos))
+    if not ips or any(info[0] != socket.AF_INET for info in infos):
+        return None
+    if any(ipaddress.ip_address(ip).is_loopback for ip in ips):
+        # scapy's L3 socket does not see loopback replies
+        return None
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_SYN_SCAN_EXEC, _syn_scan_blocking, ips, tuple(ports), timeout)
+    except (ImportError, OSError):
+        return None
+
+PORTSCAN_CACHE_TTL = 10.0
+_PORTSCAN_CACHE: Dict[tuple, Tuple[float, List[Tuple[int, bool]]]] = {}
+
+async def scan_host(host: str, ports: Tuple[int, ...] = COMMON_PORTS, syn: bool = False) -> List[Tuple[int, bool]]:
+    """
+    Scan ports on host with an RTT-scaled timeout, using a SYN scan when syn is set and available.
+    Results are cached for PORTSCAN_CACHE_TTL seconds so repeated scans of the same host skip the network.
+    """
+    key = (host.lower(), ports, syn)
+    now = time.monotonic()
+    entry = _PORTSCAN_CACHE.get(key)
+    if entry and now - entry[0] < PORTSCAN_CACHE_TTL:
+        return entry[1]
+
+    timeout = await adaptive_timeout(host)
+    results = await syn_scan(host, ports, timeout) if syn else None
+    if results is None:
+        results = await connect_scan(host, ports, timeout)
+
+    # drop stale entries so the cache stays small
+    for k in [k for k, (t, _) in _PORTSCAN_CACHE.items() if now - t > 60]:
+        del _PORTSCAN_CACHE[k]
+    _PORTSCAN_CACHE[key] = (now, results)
+    return results